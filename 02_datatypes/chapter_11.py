@@ -0,0 +1,178 @@
+# Chapter 11: String Interning & Flyweight Pool for Order Fields
+
+# In chapter_1.py and chapter_6.py we saw that id() tells us WHICH object
+# we are holding, and that building a string (concatenation, decoding input)
+# creates a NEW object every time - even when the text is exactly the same.
+#
+# In a busy chai shop the same values repeat again and again:
+#   "masala chai", "ginger chai", "large", "medium", "less sugar please" ...
+# If every order keeps its own copy, memory is wasted on duplicates.
+#
+# Interning = keep ONE shared object per distinct value and reuse it.
+# - sys.intern(text)  -> Python's built-in pool (good for few distinct values)
+# - Flyweight table   -> our own bounded pool with eviction (good for fields
+#                        like customer notes that can have MANY distinct values)
+
+import sys
+import tracemalloc
+from collections import OrderedDict
+
+# ============================================
+# SAME TEXT, DIFFERENT OBJECTS
+# ============================================
+
+# Strings built at runtime (like text read from an order form) are new objects
+first = "".join(["masala", " ", "chai"])
+second = "".join(["masala", " ", "chai"])
+print(f"Same value? {first == second}")     # True
+print(f"Same object? {first is second}")    # False - two copies in memory!
+
+# sys.intern() returns the ONE shared copy for that text
+first = sys.intern(first)
+second = sys.intern(second)
+print(f"Same object after intern? {first is second}")  # True
+
+# ============================================
+# FLYWEIGHT POOL WITH EVICTION
+# ============================================
+
+# sys.intern() never forgets anything, so it is only safe for fields with a
+# small, known set of values (chai type, size). Customer notes are free text:
+# we keep only the most recently used ones, so the pool cannot grow forever.
+
+
+class FlyweightPool:
+    """Bounded pool of shared strings, least recently used one is evicted."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.pool = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+    def get(self, value):
+        self.lookups += 1
+        shared = self.pool.get(value)
+        if shared is not None:
+            # Duplicate found - the caller's copy can be thrown away
+            self.hits += 1
+            if shared is not value:
+                self.bytes_saved += sys.getsizeof(value)
+            self.pool.move_to_end(value)
+            return shared
+        self.pool[value] = value
+        if len(self.pool) > self.max_size:
+            self.pool.popitem(last=False)
+            self.evictions += 1
+        return value
+
+
+class OrderInterner:
+    """Shares repeated order field values at the point where orders come in."""
+
+    def __init__(self, intern_fields=("type", "size"), pooled_fields=("customer_note",), pool_size=1024):
+        self.intern_fields = intern_fields
+        self.pooled_fields = pooled_fields
+        self.pool = FlyweightPool(pool_size)
+        self.lookups = 0
+        self.hits = 0
+        self.bytes_saved = 0
+
+    def _intern(self, value):
+        self.lookups += 1
+        shared = sys.intern(value)
+        # A different object back means an equal string was already in the
+        # pool, and our copy can be dropped. No set of "seen" values needed -
+        # keeping one would hold on to every distinct value forever.
+        if shared is not value:
+            self.hits += 1
+            self.bytes_saved += sys.getsizeof(value)
+        return shared
+
+    def ingest(self, order):
+        """Return the order with repeated string fields replaced by shared objects."""
+        for field in self.intern_fields:
+            value = order.get(field)
+            if isinstance(value, str):
+                order[field] = self._intern(value)
+        for field in self.pooled_fields:
+            value = order.get(field)
+            if isinstance(value, str):
+                order[field] = self.pool.get(value)
+        return order
+
+    def stats(self):
+        lookups = self.lookups + self.pool.lookups
+        hits = self.hits + self.pool.hits
+        return {
+            "lookups": lookups,
+            "dedup_ratio": hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved + self.pool.bytes_saved,
+            "pool_size": len(self.pool.pool),
+            "evictions": self.pool.evictions,
+        }
+
+
+# ============================================
+# OPEN ORDERS - WITHOUT vs WITH INTERNING
+# ============================================
+
+chai_types = ["masala chai", "ginger chai", "elaichi chai", "plain chai"]
+sizes = ["small", "medium", "large"]
+notes = ["less sugar please", "extra hot", "no sugar", "add more ginger"]
+
+
+def read_order(number):
+    # .encode().decode() gives a brand new string object, just like text
+    # arriving from a network request or a file
+    note = notes[number % len(notes)].encode().decode()
+    if number % 5 == 0:
+        # Every 5th note is (almost) one of a kind - far more distinct
+        # notes than the pool can hold, so old ones must be evicted
+        note = f"{note} (table {number % 2000})"
+    return {
+        "id": number,
+        "type": chai_types[number % len(chai_types)].encode().decode(),
+        "size": sizes[number % len(sizes)].encode().decode(),
+        "sugar": number % 3,
+        "customer_note": note,
+    }
+
+
+def open_orders_memory(count, interner=None):
+    tracemalloc.start()
+    orders = []
+    for number in range(count):
+        order = read_order(number)
+        if interner is not None:
+            order = interner.ingest(order)
+        orders.append(order)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+order_count = 50_000
+raw_bytes = open_orders_memory(order_count)
+interner = OrderInterner(pool_size=256)
+interned_bytes = open_orders_memory(order_count, interner)
+stats = interner.stats()
+
+print(f"\nOpen orders: {order_count}")
+print(f"Memory without interning: {raw_bytes / 1024:.0f} KiB")
+print(f"Memory with interning: {interned_bytes / 1024:.0f} KiB")
+print(f"Shrink factor: {raw_bytes / interned_bytes:.2f}x")
+print(f"Dedup ratio: {stats['dedup_ratio']:.1%}")
+print(f"Bytes saved (duplicate strings dropped): {stats['bytes_saved']}")
+print(f"Notes pool size: {stats['pool_size']} of {interner.pool.max_size} (evictions: {stats['evictions']})")
+print(f"Notes pool hit rate: {interner.pool.hits / interner.pool.lookups:.1%} "
+      f"- common notes stay in the pool, one-off notes get evicted")
+
+# Key takeaways:
+# - Equal strings are not always the same object (== vs is)
+# - sys.intern() shares low-cardinality values (chai type, size) for free
+# - A bounded flyweight pool shares high-cardinality values without
+#   letting memory grow forever (LRU eviction)
+# - Intern ONCE at the ingest boundary, then the whole system benefits
@@ -0,0 +1,354 @@
+# Chapter 12: Checkpoints - Saving Shop State Incrementally
+
+# The shop state from the earlier chapters is just dictionaries:
+#   orders (chapter_10.py), the nested tea_shop menu, stock built with
+#   dict.fromkeys(), and spice sets (chapter_9.py) stored per outlet.
+#
+# Saving EVERYTHING every time is slow when only a few keys changed.
+# Better idea:
+# 1. Remember which keys changed since the last save ("dirty" keys)
+# 2. Write only those keys as a small binary DELTA
+# 3. Write the delta on a background thread so orders keep flowing
+# 4. Restore = last FULL snapshot + every delta written after it
+#
+# Checkpoint cost now depends on what changed, not on total state size.
+
+import os
+import pickle
+import queue
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+# Delta log = 16-byte id of its snapshot, then records of
+#   4-byte length + zlib(pickle((changes, deleted)))
+# changes = {(section, key): new value}, deleted = {(section, key), ...}
+SNAPSHOT_ID_SIZE = 16
+RECORD_HEADER = struct.Struct("<I")
+
+
+class CheckpointError(RuntimeError):
+    """Raised when the background writer failed to save a checkpoint."""
+
+
+# ============================================
+# DICTIONARY THAT REMEMBERS ITS CHANGES
+# ============================================
+
+
+class TrackedDict(dict):
+    """dict that reports every changed key to its shop state."""
+
+    def __init__(self, state, section, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.state = state
+        self.section = section
+
+    def __setitem__(self, key, value):
+        with self.state.lock:
+            super().__setitem__(key, value)
+            self.state.dirty.add((self.section, key))
+
+    def __delitem__(self, key):
+        with self.state.lock:
+            super().__delitem__(key)
+            self.state.dirty.add((self.section, key))
+
+    def pop(self, key, *default):
+        with self.state.lock:
+            if key in self:
+                self.state.dirty.add((self.section, key))
+            return super().pop(key, *default)
+
+    def popitem(self):
+        with self.state.lock:
+            key, value = super().popitem()
+            self.state.dirty.add((self.section, key))
+            return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        # dict's own |= (chapter_10.py) skips __setitem__, so route it here
+        self.update(other)
+        return self
+
+    def clear(self):
+        with self.state.lock:
+            self.state.dirty.update((self.section, key) for key in self)
+            super().clear()
+
+
+class ShopState:
+    """All shop dictionaries, grouped by section name ("orders", "menu", ...)."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.dirty = set()
+        self.sections = {}
+
+    def section(self, name, initial=None):
+        if name not in self.sections:
+            tracked = TrackedDict(self, name)
+            self.sections[name] = tracked
+            if initial:
+                tracked.update(initial)
+        return self.sections[name]
+
+    def touch(self, section, key):
+        # Nested values (tea_shop["chai"]["Masala"]["price"] = 35) change
+        # without going through our dict, so mark the top-level key by hand
+        with self.lock:
+            self.dirty.add((section, key))
+
+    def as_plain_dicts(self):
+        return {name: dict(data) for name, data in self.sections.items()}
+
+
+# ============================================
+# CHECKPOINT WRITER
+# ============================================
+
+
+class Checkpointer:
+    """Writes full snapshots and dirty-key deltas for a ShopState."""
+
+    def __init__(self, state, folder):
+        self.state = state
+        self.snapshot_path = os.path.join(folder, "shop.snapshot")
+        self.delta_path = os.path.join(folder, "shop.deltas")
+        # Random id per snapshot (not a counter), so a restarted program
+        # can never reuse the id of a log left over from an earlier run
+        self.snapshot_id = None
+        self.snapshot_bytes = 0
+        # Bytes of the delta log known to hold complete records
+        self.log_size = 0
+        self.error = None
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def full_snapshot(self):
+        """Queue a save of everything; the writer then starts a fresh delta log.
+
+        The state lock is only held while the section dicts are copied
+        (shallow, much cheaper than pickling). Pickling happens on the writer
+        thread - it still shares the GIL with order code, but no longer
+        blocks every TrackedDict write for the whole pickle.
+        The copies share nested values with the live state, so replace a
+        nested value (menu["Masala"] = {...}) rather than editing it in
+        place while a snapshot is being written.
+        """
+        with self.state.lock:
+            self.snapshot_id = uuid.uuid4().bytes
+            sections = self.state.as_plain_dicts()
+            self.state.dirty.clear()
+            # Queued under the lock: deltas before it go to the old log,
+            # deltas after it go to the new one
+            self.pending.put(("snapshot", self.snapshot_id, sections))
+
+    def checkpoint(self):
+        """Queue a delta with only the keys changed since the last checkpoint."""
+        if self.snapshot_id is None:
+            # Deltas only make sense on top of a snapshot this program wrote
+            raise CheckpointError("Take a full_snapshot() before the first checkpoint()")
+        with self.state.lock:
+            dirty, self.state.dirty = self.state.dirty, set()
+            changes = {}
+            deleted = set()
+            for section, key in dirty:
+                data = self.state.sections[section]
+                if key in data:
+                    changes[(section, key)] = data[key]
+                else:
+                    deleted.add((section, key))
+            # pickle now, while values can't change under us
+            payload = pickle.dumps((changes, deleted), protocol=pickle.HIGHEST_PROTOCOL)
+            if dirty:
+                self.pending.put(("delta", self.snapshot_id, payload))
+        return len(dirty)
+
+    def _replace_file(self, path, data):
+        # Write a temp file, then swap it in: a crash leaves old OR new, never half
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as temp:
+            temp.write(data)
+            temp.flush()
+            os.fsync(temp.fileno())
+        os.replace(temp_path, path)
+
+    def _write_loop(self):
+        while True:
+            task = self.pending.get()
+            try:
+                if task is None:
+                    return
+                kind, snapshot_id, payload = task
+                if kind == "snapshot":
+                    data = pickle.dumps(
+                        {"snapshot_id": snapshot_id, "sections": payload},
+                        protocol=pickle.HIGHEST_PROTOCOL,
+                    )
+                    self._replace_file(self.snapshot_path, zlib.compress(data))
+                    # The log starts with its snapshot id. If we crash before
+                    # this line, restore() sees another snapshot's id and skips
+                    # those deltas - they are already inside the new snapshot.
+                    self._replace_file(self.delta_path, snapshot_id)
+                    self.snapshot_bytes = len(data)
+                    self.log_size = SNAPSHOT_ID_SIZE
+                    self.error = None
+                elif self.error is None:
+                    # After a failure the log has a gap, so later deltas are
+                    # dropped until a full snapshot succeeds again
+                    self._append_delta(zlib.compress(payload))
+            except Exception as error:
+                # Keep the thread alive so flush() can report instead of hanging
+                self.error = error
+            finally:
+                self.pending.task_done()
+
+    def _append_delta(self, record):
+        with open(self.delta_path, "r+b") as deltas:
+            # Cut off anything after the last complete record (half a record
+            # from an interrupted write), or restore() would stop there and
+            # never see the records we add after it
+            deltas.truncate(self.log_size)
+            deltas.seek(self.log_size)
+            deltas.write(RECORD_HEADER.pack(len(record)))
+            deltas.write(record)
+            deltas.flush()
+            # On disk before flush() returns - same promise as the snapshot
+            os.fsync(deltas.fileno())
+        self.log_size += RECORD_HEADER.size + len(record)
+
+    def flush(self):
+        """Wait for queued writes; raise CheckpointError if any of them failed."""
+        self.pending.join()
+        if self.error is not None:
+            raise CheckpointError(
+                f"Checkpoint write failed, take a full_snapshot(): {self.error}"
+            ) from self.error
+
+    def close(self):
+        """Finish queued writes and stop the writer thread."""
+        self.pending.put(None)
+        self.writer.join()
+
+    def _read_deltas(self, deltas):
+        # A crash mid-write can leave a cut-off last record: keep every
+        # complete record before it and stop there
+        while len(header := deltas.read(RECORD_HEADER.size)) == RECORD_HEADER.size:
+            (size,) = RECORD_HEADER.unpack(header)
+            record = deltas.read(size)
+            if len(record) < size:
+                return
+            try:
+                yield pickle.loads(zlib.decompress(record))
+            except (zlib.error, pickle.UnpicklingError, EOFError):
+                return
+
+    def restore(self):
+        """Rebuild a new ShopState from the snapshot plus all deltas."""
+        self.flush()
+        with open(self.snapshot_path, "rb") as snapshot:
+            saved = pickle.loads(zlib.decompress(snapshot.read()))
+        sections = saved["sections"]
+        if os.path.exists(self.delta_path):
+            with open(self.delta_path, "rb") as deltas:
+                if deltas.read(SNAPSHOT_ID_SIZE) == saved["snapshot_id"]:
+                    for changes, deleted in self._read_deltas(deltas):
+                        for (section, key), value in changes.items():
+                            sections.setdefault(section, {})[key] = value
+                        for section, key in deleted:
+                            sections.get(section, {}).pop(key, None)
+        restored = ShopState()
+        for name, data in sections.items():
+            restored.section(name, data)
+        restored.dirty.clear()
+        return restored
+
+
+# ============================================
+# DEMO - A DAY AT THE SHOP
+# ============================================
+
+shop = ShopState()
+menu = shop.section("menu", {
+    "Masala": {"price": 30, "available": True},
+    "Ginger": {"price": 25, "available": True},
+    "Plain": {"price": 20, "available": False},
+})
+stock = shop.section("stock", dict.fromkeys(["Masala", "Ginger", "Green"], 10))
+spices = shop.section("spices", {
+    "Mumbai": frozenset({"cardamom", "ginger", "cinnamon"}),
+    "Delhi": frozenset({"cloves", "ginger", "black pepper"}),
+})
+orders = shop.section("orders")
+
+# Lots of existing orders make the full state big
+for number in range(100_000):
+    orders[number] = {"type": "masala chai", "size": "large", "sugar": number % 3}
+
+folder = tempfile.mkdtemp(prefix="chai_checkpoint_")
+checkpointer = Checkpointer(shop, folder)
+
+start = time.perf_counter()
+checkpointer.full_snapshot()
+pause_time = time.perf_counter() - start
+checkpointer.flush()
+snapshot_time = time.perf_counter() - start
+print(f"Full snapshot: {checkpointer.snapshot_bytes} bytes in {snapshot_time * 1000:.1f} ms "
+      f"(full_snapshot() returned after {pause_time * 1000:.1f} ms)")
+
+# A few changes happen...
+orders[100_000] = {"type": "ginger chai", "size": "medium", "sugar": 1}
+del orders[0]
+stock["Masala"] -= 1
+menu["Masala"]["price"] = 35      # nested change...
+shop.touch("menu", "Masala")      # ...so mark it ourselves
+spices["Delhi"] = spices["Delhi"] | {"cardamom"}
+
+start = time.perf_counter()
+changed = checkpointer.checkpoint()
+checkpoint_time = time.perf_counter() - start
+print(f"Delta checkpoint: {changed} keys queued in {checkpoint_time * 1000:.3f} ms")
+
+# Orders keep coming while the delta is written in the background
+orders[100_001] = {"type": "plain chai", "size": "small", "sugar": 0}
+checkpointer.checkpoint()
+
+restored = checkpointer.restore()
+print(f"Delta log size: {os.path.getsize(checkpointer.delta_path)} bytes")
+print(f"Restored matches live state? {restored.as_plain_dicts() == shop.as_plain_dicts()}")
+print(f"Restored Masala price: {restored.sections['menu']['Masala']['price']}")
+print(f"Restored Delhi spices: {sorted(restored.sections['spices']['Delhi'])}")
+
+# A crash mid-write leaves half a record at the end of the log
+with open(checkpointer.delta_path, "ab") as deltas:
+    deltas.write(RECORD_HEADER.pack(100) + b"half a rec")
+restored = checkpointer.restore()
+print(f"Restored despite cut-off record? {restored.as_plain_dicts() == shop.as_plain_dicts()}")
+
+checkpointer.close()
+shutil.rmtree(folder)
+
+# Key takeaways:
+# - Track dirty keys as they change, not by comparing whole states
+# - Deltas are small: cost grows with what changed, not total size
+# - Background writer keeps slow disk work away from order processing
+# - Snapshots are swapped in atomically (temp file + os.replace), deltas
+#   are fsync'd, and a cut-off last delta is skipped on restore and cut
+#   away before the next append, so a crash never corrupts a restore
+# - Nested mutable values need an explicit touch() - same identity lesson
+#   as chapter_1.py: changing the inside of an object doesn't rebind the key
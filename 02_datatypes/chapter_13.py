@@ -0,0 +1,158 @@
+# Chapter 13: Memoized Recipe Pricing with Frozenset Keys
+
+# chapter_9.py showed frozenset - an immutable set that is HASHABLE.
+# chapter_7.py showed tuples used as dictionary keys.
+# Put them together and we get a great cache key:
+#   (frozenset of ingredients, size)
+# Order doesn't matter: {"ginger", "cardamom"} == {"cardamom", "ginger"}
+#
+# Pricing a custom chai = sum of ingredient costs + combo discounts.
+# There are only a few thousand distinct combos, so compute each ONCE
+# (memoization) and reuse it for every order.
+#
+# Two problems to solve:
+# 1. Cache must not grow forever -> keep the N most recently used (LRU)
+# 2. When an ingredient price changes, only combos USING that ingredient
+#    are wrong -> reverse index: ingredient -> set of cached keys
+
+import random
+import time
+from collections import OrderedDict
+
+# ============================================
+# FROZENSET AS A DICTIONARY KEY
+# ============================================
+
+combo_a = frozenset(["ginger", "cardamom"])
+combo_b = frozenset(["cardamom", "ginger"])
+print(f"Same combo? {combo_a == combo_b}")              # True - order ignored
+print(f"Same hash? {hash(combo_a) == hash(combo_b)}")    # True - usable as key
+
+# A normal set can't be a key:
+# {{"ginger"}: 10}  # TypeError: unhashable type: 'set'
+
+# ============================================
+# PRICE LIST & COMBO DISCOUNTS
+# ============================================
+
+ingredient_prices = {
+    "black tea": 5, "milk": 8, "sugar": 2, "ginger": 4, "cardamom": 6,
+    "cinnamon": 5, "cloves": 4, "black pepper": 3, "saffron": 20,
+    "honey": 7, "lemon": 3, "mint": 3, "tulsi": 4, "jaggery": 3,
+}
+size_multiplier = {"small": 1.0, "medium": 1.5, "large": 2.0}
+
+# (required ingredients, discount in rupees)
+combo_discounts = [
+    (frozenset({"ginger", "cardamom"}), 2),
+    (frozenset({"cinnamon", "cloves", "black pepper"}), 3),
+    (frozenset({"lemon", "honey"}), 1),
+]
+
+
+def compute_price(ingredients, size):
+    """Price a recipe from scratch - the slow path we want to cache."""
+    total = sum(ingredient_prices[item] for item in ingredients)
+    for required, discount in combo_discounts:
+        # issubset() from chapter_9.py - does this recipe contain the combo?
+        if required <= ingredients:
+            total -= discount
+    return round(total * size_multiplier[size], 2)
+
+
+# ============================================
+# PRICING MEMO - LRU + REVERSE INDEX
+# ============================================
+
+
+class PricingMemo:
+    """Caches recipe prices by (frozenset of ingredients, size)."""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        # ingredient -> keys of cached combos that contain it
+        self.by_ingredient = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def price(self, ingredients, size):
+        key = (frozenset(ingredients), size)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return cached
+        self.misses += 1
+        value = compute_price(key[0], size)
+        self.cache[key] = value
+        for item in key[0]:
+            self.by_ingredient.setdefault(item, set()).add(key)
+        if len(self.cache) > self.max_size:
+            oldest, _ = self.cache.popitem(last=False)
+            self._unindex(oldest)
+        return value
+
+    def _unindex(self, key):
+        for item in key[0]:
+            keys = self.by_ingredient.get(item)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_ingredient[item]
+
+    def set_ingredient_price(self, ingredient, new_price):
+        """Change a price and drop ONLY the cached combos that use it."""
+        ingredient_prices[ingredient] = new_price
+        for key in list(self.by_ingredient.get(ingredient, ())):
+            del self.cache[key]
+            self._unindex(key)
+            self.invalidations += 1
+
+
+# ============================================
+# DEMO - PRICING A STREAM OF ORDERS
+# ============================================
+
+random.seed(7)
+all_ingredients = list(ingredient_prices)
+order_stream = []
+for _ in range(200_000):
+    recipe = ["black tea", "milk"] + random.sample(all_ingredients[2:], random.randint(1, 3))
+    random.shuffle(recipe)   # same combo, different order - still one cache entry
+    order_stream.append((recipe, random.choice(list(size_multiplier))))
+
+start = time.perf_counter()
+uncached_total = sum(compute_price(frozenset(recipe), size) for recipe, size in order_stream)
+uncached_time = time.perf_counter() - start
+
+memo = PricingMemo(max_size=2048)
+start = time.perf_counter()
+cached_total = sum(memo.price(recipe, size) for recipe, size in order_stream)
+cached_time = time.perf_counter() - start
+
+print(f"\nOrders priced: {len(order_stream)}")
+print(f"Totals match? {round(uncached_total, 2) == round(cached_total, 2)}")
+print(f"Without memo: {uncached_time * 1000:.0f} ms")
+print(f"With memo: {cached_time * 1000:.0f} ms")
+print(f"Cache hits: {memo.hits}, misses: {memo.misses}, cached combos: {len(memo.cache)}")
+
+# Saffron gets expensive - only saffron combos are recomputed
+print("\n--- Precise Invalidation ---")
+saffron_chai = ["black tea", "milk", "saffron"]
+ginger_chai = ["black tea", "milk", "ginger", "cardamom"]
+print(f"Saffron chai (large) before: {memo.price(saffron_chai, 'large')}")
+print(f"Ginger chai (large) before: {memo.price(ginger_chai, 'large')}")
+
+cached_before = len(memo.cache)
+memo.set_ingredient_price("saffron", 25)
+print(f"Combos invalidated: {cached_before - len(memo.cache)} of {cached_before}")
+print(f"Saffron chai (large) after: {memo.price(saffron_chai, 'large')}")
+print(f"Ginger chai still cached? {(frozenset(ginger_chai), 'large') in memo.cache}")
+
+# Key takeaways:
+# - frozenset is hashable, so (frozenset, size) tuples make order-free keys
+# - OrderedDict.move_to_end() + popitem(last=False) = simple LRU cache
+# - A reverse index (ingredient -> keys) turns "clear everything" into
+#   "clear exactly what's affected" when a price changes
@@ -0,0 +1,395 @@
+# Chapter 14: Binary Wire Format - bytes, struct & memoryview
+
+# Every chapter so far reports state like this:
+#   print(f"Chai order: {chai_order}")
+# That's great for learning, but a program reading it has to PARSE text.
+#
+# chapter_6.py showed that text becomes bytes with .encode().
+# Here we go one step further and design our own compact binary format:
+# - struct: packs numbers into a FIXED layout (hot fields: id, size, sugar...)
+# - varint: small numbers take fewer bytes (used for string lengths)
+# - length-prefixed strings: <length><utf-8 bytes>
+# - header with a SCHEMA VERSION so old data can still be read
+# - memoryview: write into and read from one big buffer WITHOUT copying it
+#
+# Batch layout:
+#   header  = magic "CHAI" | version of that record kind (1 byte) | record kind (1 byte) | count (4 bytes)
+#   records = fixed struct part + varint-prefixed strings, one after another
+
+import json
+import pickle
+import struct
+import time
+
+MAGIC = b"CHAI"
+
+HEADER = struct.Struct("<4sBBI")
+
+# Record kinds
+ORDER = 1
+MENU_ITEM = 2
+THERMOSTAT = 3
+
+# Each record kind has its own schema version (the newest one we write)
+SCHEMA_VERSIONS = {ORDER: 2, MENU_ITEM: 1, THERMOSTAT: 1}
+
+# Small lookup tables: a whole word becomes a single byte
+SIZES = ("small", "medium", "large")
+SIZE_CODES = {size: code for code, size in enumerate(SIZES)}
+DEVICE_STATUSES = ("active", "offline")
+STATUS_CODES = {status: code for code, status in enumerate(DEVICE_STATUSES)}
+
+# Fixed "hot" layouts, per record kind and schema version
+# < little-endian, I = 4-byte unsigned, B = 1-byte unsigned, ? = bool, h = 2-byte signed
+ORDER_V1 = struct.Struct("<IBB")         # id, size, sugar
+ORDER_V2 = struct.Struct("<IBBI")        # id, size, sugar, price in paise
+MENU_ITEM_V1 = struct.Struct("<I?")      # price in paise, available
+THERMOSTAT_V1 = struct.Struct("<IhB")    # timestamp, temp in tenths of a degree, status
+
+
+class WireFormatError(ValueError):
+    """Raised when a buffer isn't a batch we know how to read."""
+
+
+# What struct, memoryview and the lookup tables raise on short or bad bytes
+DECODE_ERRORS = (struct.error, IndexError, UnicodeDecodeError)
+
+
+# ============================================
+# VARINTS & LENGTH-PREFIXED STRINGS
+# ============================================
+
+# A varint stores 7 bits per byte; the top bit says "more bytes follow".
+# Lengths under 128 (almost every chai name) need just ONE byte.
+
+
+def write_varint(view, pos, number):
+    while number >= 0x80:
+        view[pos] = (number & 0x7F) | 0x80
+        number >>= 7
+        pos += 1
+    view[pos] = number
+    return pos + 1
+
+
+def read_varint(view, pos):
+    number = 0
+    shift = 0
+    while True:
+        byte = view[pos]
+        pos += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, pos
+        shift += 7
+
+
+def read_string(view, pos):
+    length = view[pos]
+    if length < 0x80:
+        # Fast path: one-byte length
+        pos += 1
+    else:
+        length, pos = read_varint(view, pos)
+    end = pos + length
+    if end > len(view):
+        raise WireFormatError("String runs past the end of the batch")
+    # str() decodes straight from the memoryview slice - no bytes copy
+    return str(view[pos:end], "utf-8"), end
+
+
+# ============================================
+# ENCODERS
+# ============================================
+
+# Encoders write straight into ONE bytearray through a memoryview:
+# struct.pack_into() puts the fixed fields in place, strings are copied in
+# by slice assignment. No bytes object per field, no "+=" growing copies.
+# Turning text into UTF-8 does need one bytes object per string, so each
+# distinct string is encoded once and reused (the interning idea from
+# chapter_11.py) - "masala chai" is encoded once, not a million times.
+
+MAX_CACHED_STRINGS = 4096
+
+
+def put_string(view, pos, data):
+    length = len(data)
+    if length < 0x80:
+        view[pos] = length    # fast path: one-byte length
+        pos += 1
+    else:
+        pos = write_varint(view, pos, length)
+    end = pos + length
+    view[pos:end] = data
+    return end
+
+
+class BatchWriter:
+    """Packs one batch into a growing bytearray through a memoryview."""
+
+    def __init__(self, kind, version, count, record_guess=32):
+        self.buffer = bytearray(HEADER.size + count * record_guess)
+        self.view = memoryview(self.buffer)
+        HEADER.pack_into(self.view, 0, MAGIC, version, kind, count)
+        self.pos = HEADER.size
+        self.encoded = {}
+
+    def reserve(self, size):
+        if self.pos + size > len(self.buffer):
+            # A bytearray can't resize while a memoryview points at it
+            self.view.release()
+            self.buffer.extend(bytes(max(size, len(self.buffer))))
+            self.view = memoryview(self.buffer)
+
+    def encode(self, text):
+        data = self.encoded.get(text)
+        if data is None:
+            data = text.encode("utf-8")
+            if len(self.encoded) < MAX_CACHED_STRINGS:
+                self.encoded[text] = data
+        return data
+
+    def record(self, layout, values, texts=()):
+        """Write one record: fixed fields, then each string length-prefixed."""
+        strings = [self.encode(text) for text in texts]
+        # a length varint is at most 5 bytes here
+        self.reserve(layout.size + sum(len(data) + 5 for data in strings))
+        pos = self.pos
+        layout.pack_into(self.view, pos, *values)
+        pos += layout.size
+        for data in strings:
+            pos = put_string(self.view, pos, data)
+        self.pos = pos
+
+    def finish(self):
+        data = bytes(self.view[:self.pos])
+        self.view.release()
+        return data
+
+
+def encode_orders(orders, version=SCHEMA_VERSIONS[ORDER]):
+    if version not in (1, 2):
+        raise ValueError(f"Unknown order schema version: {version}")
+    writer = BatchWriter(ORDER, version, len(orders))
+    if version == 1:
+        for order in orders:
+            writer.record(
+                ORDER_V1, (order["id"], SIZE_CODES[order["size"]], order["sugar"]), (order["type"],)
+            )
+        return writer.finish()
+    # Orders are the hot path: the same steps as record(), with everything
+    # looked up once outside the loop
+    pack_into = ORDER_V2.pack_into
+    fixed_size = ORDER_V2.size
+    encoded = writer.encoded
+    encode = writer.encode
+    for order in orders:
+        chai_type = encoded.get(order["type"]) or encode(order["type"])
+        note = order.get("customer_note", "")
+        note = encoded.get(note) or encode(note)
+        writer.reserve(fixed_size + len(chai_type) + len(note) + 10)
+        view = writer.view
+        pos = writer.pos
+        pack_into(view, pos, order["id"], SIZE_CODES[order["size"]], order["sugar"], round(order["price"] * 100))
+        pos = put_string(view, pos + fixed_size, chai_type)
+        writer.pos = put_string(view, pos, note)
+    return writer.finish()
+
+
+def encode_menu_items(items):
+    writer = BatchWriter(MENU_ITEM, SCHEMA_VERSIONS[MENU_ITEM], len(items))
+    for name, details in items.items():
+        writer.record(MENU_ITEM_V1, (round(details["price"] * 100), details["available"]), (name,))
+    return writer.finish()
+
+
+def encode_thermostat_readings(readings):
+    writer = BatchWriter(THERMOSTAT, SCHEMA_VERSIONS[THERMOSTAT], len(readings), THERMOSTAT_V1.size)
+    for reading in readings:
+        writer.record(
+            THERMOSTAT_V1,
+            (reading["timestamp"], round(reading["temp"] * 10), STATUS_CODES[reading["device_status"]]),
+        )
+    return writer.finish()
+
+
+# ============================================
+# DECODERS
+# ============================================
+
+
+def check_end(view, pos, what):
+    # The count in the header must account for every byte of the batch
+    if pos != len(view):
+        raise WireFormatError(f"{len(view) - pos} unexpected bytes after the last {what}")
+
+
+def read_header(data, expected_kind):
+    view = memoryview(data)
+    try:
+        magic, version, kind, count = HEADER.unpack_from(view, 0)
+    except struct.error as error:
+        raise WireFormatError("Batch is shorter than its header") from error
+    if magic != MAGIC:
+        raise WireFormatError("Not a CHAI batch")
+    if kind != expected_kind:
+        raise WireFormatError(f"Expected record kind {expected_kind}, got {kind}")
+    newest = SCHEMA_VERSIONS[kind]
+    if not 1 <= version <= newest:
+        raise WireFormatError(f"Unknown schema version {version} (newest is {newest})")
+    return view, version, count, HEADER.size
+
+
+def decode_orders(data):
+    view, version, count, pos = read_header(data, ORDER)
+    orders = []
+    try:
+        for _ in range(count):
+            if version == 1:
+                order_id, size, sugar = ORDER_V1.unpack_from(view, pos)
+                pos += ORDER_V1.size
+                chai_type, pos = read_string(view, pos)
+                # Old batches had no price or note - fill in safe defaults
+                price, note = 0.0, ""
+            else:
+                order_id, size, sugar, paise = ORDER_V2.unpack_from(view, pos)
+                pos += ORDER_V2.size
+                chai_type, pos = read_string(view, pos)
+                note, pos = read_string(view, pos)
+                price = paise / 100
+            orders.append({
+                "id": order_id, "type": chai_type, "size": SIZES[size],
+                "sugar": sugar, "price": price, "customer_note": note,
+            })
+    except DECODE_ERRORS as error:
+        raise WireFormatError(f"Corrupt order batch: {error}") from error
+    check_end(view, pos, "order")
+    return orders
+
+
+def decode_menu_items(data):
+    view, _, count, pos = read_header(data, MENU_ITEM)
+    items = {}
+    try:
+        for _ in range(count):
+            paise, available = MENU_ITEM_V1.unpack_from(view, pos)
+            pos += MENU_ITEM_V1.size
+            name, pos = read_string(view, pos)
+            items[name] = {"price": paise / 100, "available": available}
+    except DECODE_ERRORS as error:
+        raise WireFormatError(f"Corrupt menu batch: {error}") from error
+    check_end(view, pos, "menu item")
+    return items
+
+
+def decode_thermostat_readings(data):
+    view, _, count, pos = read_header(data, THERMOSTAT)
+    # Fixed-size records only: iter_unpack walks the buffer in one go
+    records = view[pos:pos + count * THERMOSTAT_V1.size]
+    if len(records) != count * THERMOSTAT_V1.size:
+        raise WireFormatError(f"Expected {count} thermostat readings, batch is cut short")
+    check_end(view, pos + len(records), "thermostat reading")
+    try:
+        return [
+            {"timestamp": timestamp, "temp": tenths / 10, "device_status": DEVICE_STATUSES[status]}
+            for timestamp, tenths, status in THERMOSTAT_V1.iter_unpack(records)
+        ]
+    except DECODE_ERRORS as error:
+        raise WireFormatError(f"Corrupt thermostat batch: {error}") from error
+
+
+# ============================================
+# ROUND TRIPS
+# ============================================
+
+chai_order = {"id": 1, "type": "masala chai", "size": "large", "sugar": 2,
+              "price": 30.5, "customer_note": "extra hot"}
+packed = encode_orders([chai_order])
+print(f"Text report: {len(str(chai_order))} chars")
+print(f"Binary order: {len(packed)} bytes -> {packed}")
+print(f"Decoded: {decode_orders(packed)[0]}")
+
+# Version 1 batches (written by older code) still decode
+old_batch = encode_orders([chai_order], version=1)
+print(f"Decoded v1 order: {decode_orders(old_batch)[0]}")
+
+tea_shop_menu = {
+    "Masala": {"price": 30, "available": True},
+    "Ginger": {"price": 25, "available": True},
+    "Plain": {"price": 20, "available": False},
+}
+print(f"Menu round trip OK? {decode_menu_items(encode_menu_items(tea_shop_menu)) == tea_shop_menu}")
+
+readings = [{"timestamp": 1_700_000_000 + i, "temp": 34.5 + i, "device_status": "active"} for i in range(3)]
+print(f"Thermostat round trip OK? {decode_thermostat_readings(encode_thermostat_readings(readings)) == readings}")
+
+try:
+    decode_orders(b"TEA!" + packed[4:])
+except WireFormatError as error:
+    print(f"Bad batch rejected: {error}")
+
+try:
+    decode_orders(packed + b"garbage")
+except WireFormatError as error:
+    print(f"Extra bytes rejected: {error}")
+
+try:
+    # Cut exactly on a record boundary - still caught thanks to the count
+    decode_thermostat_readings(encode_thermostat_readings(readings)[:-THERMOSTAT_V1.size])
+except WireFormatError as error:
+    print(f"Short batch rejected: {error}")
+
+# ============================================
+# BENCHMARK - CHAI vs json vs pickle
+# ============================================
+
+print("\n--- Benchmark ---")
+order_count = 1_000_000
+chai_types = ["masala chai", "ginger chai", "elaichi chai", "plain chai"]
+notes = ["", "extra hot", "less sugar please", "no sugar"]
+orders = [
+    {"id": i, "type": chai_types[i % 4], "size": SIZES[i % 3], "sugar": i % 3,
+     "price": 20 + (i % 5) * 5, "customer_note": notes[i % 4]}
+    for i in range(order_count)
+]
+
+
+def benchmark(name, encode, decode):
+    start = time.perf_counter()
+    payload = encode(orders)
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    decode(payload)
+    decode_time = time.perf_counter() - start
+    print(f"{name:<7} size: {len(payload) / 1_000_000:6.1f} MB | "
+          f"encode: {order_count / encode_time / 1000:7.0f}k orders/s | "
+          f"decode: {order_count / decode_time / 1000:7.0f}k orders/s")
+    return len(payload), encode_time, decode_time
+
+
+chai = benchmark("CHAI", encode_orders, decode_orders)
+results = {
+    "json": benchmark("json", lambda data: json.dumps(data).encode("utf-8"), json.loads),
+    "pickle": benchmark("pickle", lambda data: pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+}
+
+# Ratios from THIS run: CHAI divided by the other format, so below 1.00
+# means CHAI wins. They change from machine to machine and run to run,
+# so never copy them into comments
+print("\nCHAI / other (below 1.00 = CHAI wins):")
+for name, (size, encode_time, decode_time) in results.items():
+    print(f"  vs {name:<7} size: {chai[0] / size:.2f} | "
+          f"encode time: {chai[1] / encode_time:.2f} | "
+          f"decode time: {chai[2] / decode_time:.2f}")
+
+# Key takeaways:
+# - struct packs fixed fields into exact byte layouts (no text parsing)
+# - Lookup tables turn repeated words ("large") into 1-byte codes
+# - varint length prefixes keep short strings short
+# - A version byte in the header lets new code read old data
+# - memoryview + unpack_from/iter_unpack read a buffer without copying it
+# - Measure, don't guess: read the ratios printed above. Our format is
+#   written in pure Python while json and pickle are C, so expect it to be
+#   much smaller than json but not faster than pickle. What we gain is a
+#   fixed, documented, versioned schema that any language can read -
+#   pickle only works from Python and isn't safe on untrusted data
@@ -0,0 +1,361 @@
+# Chapter 15: Materialized Views - Reports That Update Themselves
+
+# chapter_9.py and chapter_10.py answer questions by scanning ALL the data:
+#   affordable = {k: v for k, v in prices.items() if v <= 25}
+#   common_spices = essential_spices & optional_spices
+# Fine for 4 items - slow when the shop has millions of orders and the
+# dashboard asks every second.
+#
+# Materialized view = a report that is stored and kept up to date.
+# Every insert / update / delete sends a small change (a "delta") to each
+# view, and the view adjusts its answer. Reading the report is O(1).
+#
+# Rule that makes it simple:  update = delete old row + insert new row
+
+import copy
+import heapq
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from types import MappingProxyType
+
+# ============================================
+# TABLE - ROWS + SUBSCRIBED VIEWS
+# ============================================
+
+
+class Table:
+    """Rows by key; every change is pushed to the views watching it.
+
+    The table keeps its OWN read-only copy of each row. Views need the old
+    row exactly as it was inserted to undo it, so a row dict edited in place
+    and passed to update() must not be the stored one (identity, chapter_1.py).
+    To change a row: row = dict(table.rows[key]); row["size"] = ...; update().
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+        self.views = []
+
+    def add_view(self, view):
+        self.views.append(view)
+        view.rebuild(self.rows.items())
+        return view
+
+    def insert(self, key, row):
+        if key in self.rows:
+            raise KeyError(f"{self.name}: key {key!r} already exists")
+        row = MappingProxyType(dict(row))
+        self.rows[key] = row
+        for view in self.views:
+            view.on_insert(key, row)
+
+    def update(self, key, row):
+        old = self.rows[key]
+        row = MappingProxyType(dict(row))
+        self.rows[key] = row
+        for view in self.views:
+            view.on_delete(key, old)
+            view.on_insert(key, row)
+
+    def delete(self, key):
+        old = self.rows.pop(key)
+        for view in self.views:
+            view.on_delete(key, old)
+
+    def verify(self):
+        """Rebuild every view from scratch and compare with the live result.
+
+        The live views are left untouched, so a mismatch can still be inspected.
+        """
+        for view in self.views:
+            # Same settings (field, test...); rebuild() gives the copy its own
+            # fresh containers, so the live view's data is never touched
+            rebuilt = copy.copy(view)
+            rebuilt.rebuild(self.rows.items())
+            if not view.same_result(rebuilt.result()):
+                return False
+        return True
+
+
+# ============================================
+# VIEWS
+# ============================================
+
+
+class View:
+    """Every view has on_insert(key, row), on_delete(key, row),
+    rebuild(items) and result(). key is the row's key in its Table, and
+    items are (key, row) pairs.
+
+    result() is read-only: dict results come back as a MappingProxyType,
+    a live window that follows later changes - copy it (dict(...)) to keep
+    today's numbers.
+    """
+
+    def same_result(self, other):
+        # Is our live answer the same as a result rebuilt from scratch?
+        return self.result() == other
+
+
+class CountBy(View):
+    """How many rows per group - e.g. orders per size."""
+
+    def __init__(self, field):
+        self.field = field
+        self.counts = Counter()
+
+    def on_insert(self, key, row):
+        self.counts[row[self.field]] += 1
+
+    def on_delete(self, key, row):
+        group = row[self.field]
+        self.counts[group] -= 1
+        if not self.counts[group]:
+            del self.counts[group]
+
+    def rebuild(self, items):
+        self.counts = Counter(row[self.field] for _, row in items)
+
+    def result(self):
+        return MappingProxyType(self.counts)
+
+
+class SumBy(View):
+    """Total of one field per group - e.g. revenue per size.
+
+    A row count per group tells us when a group is really empty (a total
+    of 0 doesn't - free chai still counts as an order).
+    """
+
+    def __init__(self, field, group_field):
+        self.field = field
+        self.group_field = group_field
+        self.totals = {}
+        self.counts = Counter()
+
+    def on_insert(self, key, row):
+        group = row[self.group_field]
+        self.totals[group] = self.totals.get(group, 0) + row[self.field]
+        self.counts[group] += 1
+
+    def on_delete(self, key, row):
+        group = row[self.group_field]
+        self.counts[group] -= 1
+        if self.counts[group]:
+            self.totals[group] -= row[self.field]
+        else:
+            del self.counts[group]
+            del self.totals[group]
+
+    def rebuild(self, items):
+        self.totals = {}
+        self.counts = Counter()
+        for key, row in items:
+            self.on_insert(key, row)
+
+    def result(self):
+        return MappingProxyType(self.totals)
+
+    def same_result(self, other):
+        # Adding and subtracting floats in a different order leaves tiny
+        # rounding differences (0.1 + 0.2 != 0.3), so compare with a tolerance
+        return self.totals.keys() == other.keys() and all(
+            math.isclose(total, other[group], rel_tol=1e-9, abs_tol=1e-9)
+            for group, total in self.totals.items()
+        )
+
+
+class MinMax(View):
+    """Cheapest and most expensive value, even when values repeat.
+
+    A Counter is the multiset (how many rows have each value). Two heaps
+    give the smallest/largest value; values deleted from the Counter are
+    skipped lazily when they reach the top of a heap. If stale entries
+    pile up (more than twice the distinct values), the heaps are rebuilt.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.values = Counter()
+        self.min_heap = []
+        self.max_heap = []
+
+    def on_insert(self, key, row):
+        value = row[self.field]
+        if not self.values[value]:
+            heapq.heappush(self.min_heap, value)
+            heapq.heappush(self.max_heap, -value)
+        self.values[value] += 1
+        if max(len(self.min_heap), len(self.max_heap)) > 2 * len(self.values):
+            self._rebuild_heaps()
+
+    def on_delete(self, key, row):
+        value = row[self.field]
+        self.values[value] -= 1
+        if not self.values[value]:
+            del self.values[value]
+
+    def _rebuild_heaps(self):
+        self.min_heap = list(self.values)
+        self.max_heap = [-value for value in self.values]
+        heapq.heapify(self.min_heap)
+        heapq.heapify(self.max_heap)
+
+    def rebuild(self, items):
+        self.values = Counter(row[self.field] for _, row in items)
+        self._rebuild_heaps()
+
+    def result(self):
+        while self.min_heap and self.min_heap[0] not in self.values:
+            heapq.heappop(self.min_heap)
+        while self.max_heap and -self.max_heap[0] not in self.values:
+            heapq.heappop(self.max_heap)
+        if not self.values:
+            return None
+        return self.min_heap[0], -self.max_heap[0]
+
+
+class FilterView(View):
+    """Rows that pass a test, by table key - e.g. affordable menu items.
+
+    Keyed by the table key, not a row field: two rows may share a name.
+    """
+
+    def __init__(self, test):
+        self.test = test
+        self.matches = {}
+
+    def on_insert(self, key, row):
+        if self.test(row):
+            self.matches[key] = row
+
+    def on_delete(self, key, row):
+        self.matches.pop(key, None)
+
+    def rebuild(self, items):
+        self.matches = {key: row for key, row in items if self.test(row)}
+
+    def result(self):
+        return MappingProxyType(self.matches)
+
+
+class CommonItems(View):
+    """Intersection of a set field across ALL rows - e.g. common spices.
+
+    Keep, for each spice, how many outlets have it, and bucket spices by
+    that count. Spices in every outlet = the bucket for "number of outlets".
+    result() is a frozenset, made again only after something changed.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.row_count = 0
+        self.counts = Counter()
+        self.buckets = defaultdict(set)
+        self.common = None
+
+    def _move(self, item, step):
+        old = self.counts[item]
+        self.buckets[old].discard(item)
+        self.counts[item] = old + step
+        if self.counts[item]:
+            self.buckets[old + step].add(item)
+        else:
+            del self.counts[item]
+
+    def on_insert(self, key, row):
+        self.common = None
+        self.row_count += 1
+        for item in row[self.field]:
+            self._move(item, 1)
+
+    def on_delete(self, key, row):
+        self.common = None
+        self.row_count -= 1
+        for item in row[self.field]:
+            self._move(item, -1)
+
+    def rebuild(self, items):
+        self.row_count = 0
+        self.counts = Counter()
+        self.buckets = defaultdict(set)
+        self.common = None
+        for key, row in items:
+            self.on_insert(key, row)
+
+    def result(self):
+        if self.common is None:
+            self.common = frozenset(self.buckets.get(self.row_count, ()) if self.row_count else ())
+        return self.common
+
+
+# ============================================
+# DEMO - DAILY SHOP REPORTS
+# ============================================
+
+menu = Table("menu")
+affordable = menu.add_view(FilterView(lambda row: row["price"] <= 25))
+price_range = menu.add_view(MinMax("price"))
+
+for name, price in {"Masala": 30, "Ginger": 25, "Green": 20, "Black": 15}.items():
+    menu.insert(name, {"name": name, "price": price})
+
+print(f"Affordable chai (<=25): {sorted(affordable.result())}")
+print(f"Price range: {price_range.result()}")
+
+menu.update("Masala", {"name": "Masala", "price": 22})   # happy hour!
+menu.delete("Black")
+print(f"After happy hour - affordable: {sorted(affordable.result())}")
+print(f"After happy hour - price range: {price_range.result()}")
+
+outlets = Table("outlets")
+common_spices = outlets.add_view(CommonItems("spices"))
+outlets.insert("Mumbai", {"name": "Mumbai", "spices": {"cardamom", "ginger", "cinnamon"}})
+outlets.insert("Delhi", {"name": "Delhi", "spices": {"cloves", "ginger", "black pepper"}})
+print(f"\nCommon spices: {sorted(common_spices.result())}")
+outlets.update("Delhi", {"name": "Delhi", "spices": {"cloves", "ginger", "cardamom"}})
+print(f"Common spices after Delhi restock: {sorted(common_spices.result())}")
+
+print("\n--- Orders Stream ---")
+orders = Table("orders")
+orders_per_size = orders.add_view(CountBy("size"))
+revenue_per_size = orders.add_view(SumBy("price", "size"))
+
+random.seed(3)
+sizes = ["small", "medium", "large"]
+order_count = 200_000
+for number in range(order_count):
+    orders.insert(number, {"size": random.choice(sizes), "price": random.choice([15, 20, 25, 30])})
+for number in range(0, order_count, 10):
+    orders.delete(number)                          # cancelled orders
+for number in range(1, order_count, 10):
+    orders.update(number, {"size": "large", "price": 30})   # upsized
+
+start = time.perf_counter()
+for _ in range(10_000):
+    orders_per_size.result()
+read_time = (time.perf_counter() - start) / 10_000
+
+start = time.perf_counter()
+full_scan = Counter(row["size"] for row in orders.rows.values())
+scan_time = time.perf_counter() - start
+
+print(f"Orders per size: {dict(orders_per_size.result())}")
+print(f"Revenue per size: {revenue_per_size.result()}")
+print(f"Same as full scan? {orders_per_size.result() == full_scan}")
+print(f"Read from view: {read_time * 1_000_000:.2f} µs vs full scan: {scan_time * 1000:.1f} ms")
+try:
+    orders_per_size.result()["small"] = 0   # dashboards can read, not write
+except TypeError as error:
+    print(f"Report is read-only: {error}")
+print(f"All views verified by rebuild? {menu.verify() and outlets.verify() and orders.verify()}")
+
+# Key takeaways:
+# - Store the answer, then apply small deltas instead of rescanning
+# - update = delete old + insert new keeps every view simple
+# - Counter works as a multiset: min/max survive duplicate values
+# - Counting how many sets hold an item turns intersection into a lookup
+# - Keep rebuild() around: it's the slow-but-obviously-correct check